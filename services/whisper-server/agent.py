@@ -1,27 +1,29 @@
 import os
 import json
 import datetime
-from openai import OpenAI
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from confirmation_store import PendingConfirmationStore
+from llm_manager import LLMManager, PRIORITY_INTERACTIVE, TASK_INTENT, TASK_EVENT_MATCHING
 
 # Scopes required for Google Calendar
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
 class CalendarAgent:
-    def __init__(self):
-        # Initialize Local LLM (Ollama)
-        self.client = OpenAI(
-            base_url="http://localhost:11434/v1",
-            api_key="ollama" 
-        )
-        self.model_name = "qwen2.5:14b" 
+    def __init__(self, llm: LLMManager = None, pending: PendingConfirmationStore = None):
+        # Local LLM (Ollama), shared with other agents when provided
+        self.llm = llm or LLMManager()
+        self.model_name = self.llm.model_for(TASK_INTENT)
         
         self.creds = None
         self.service = None
         
+        # Dry-run results awaiting confirmation (interpretation + resolved event IDs).
+        # In multi-worker mode this is a proxy to the store in the inference process.
+        self.pending = pending if pending is not None else PendingConfirmationStore(ttl_seconds=300)
+        
         # Initialize Google Calendar Service (Optional)
         try:
             self._authenticate_google()
@@ -60,6 +62,32 @@ class CalendarAgent:
         self.service = build('calendar', 'v3', credentials=creds)
         print("✅ Google Calendar Service authenticated successfully!")
 
+    def calendar_account(self, auth_token: str) -> str:
+        """Id of the primary calendar (the Google account's address) the token belongs to."""
+        service = build('calendar', 'v3', credentials=Credentials(token=auth_token))
+        return service.calendars().get(calendarId='primary').execute()['id']
+
+    def list_recent_events(self, auth_token: str = None, days: int = 30, max_results: int = 250):
+        """
+        Events from the last and next `days` days (source for the transcription vocabulary).
+        Without `auth_token` this reads the server's own token.json calendar, never another caller's.
+        """
+        service = build('calendar', 'v3', credentials=Credentials(token=auth_token)) if auth_token else self.service
+        if not service:
+            return []
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delta = datetime.timedelta(days=days)
+        events_result = service.events().list(
+            calendarId='primary',
+            timeMin=(now - delta).isoformat(),
+            timeMax=(now + delta).isoformat(),
+            maxResults=max_results,
+            singleEvents=True,
+            orderBy='startTime'
+        ).execute()
+        return events_result.get('items', [])
+
     def interpret_command(self, text: str):
         """
         Uses Local LLM to interpret the natural language command.
@@ -113,12 +141,13 @@ class CalendarAgent:
 
         try:
             print(f"🤔 Asking Local AI ({self.model_name})...")
-            response = self.client.chat.completions.create(
-                model=self.model_name,
+            response = self.llm.chat(
                 messages=[
                     {"role": "system", "content": "You are a helpful calendar assistant that outputs JSON."},
                     {"role": "user", "content": prompt}
                 ],
+                model=self.model_name,
+                priority=PRIORITY_INTERACTIVE,
                 response_format={"type": "json_object"}
             )
             
@@ -128,9 +157,9 @@ class CalendarAgent:
             print(f"❌ Local AI Error: {e}")
             return {"intent": "error", "message": f"AI Error: {str(e)}. Is Ollama running?"}
 
-    def _find_event(self, summary: str, time_min: str = None):
-        """Finds an event by summary using LLM for fuzzy matching."""
-        if not self.service: return None
+    def _find_event(self, service, summary: str, time_min: str = None):
+        """Finds an event by summary using LLM for fuzzy matching (in the calendar of `service`)."""
+        if not service: return None
         
         if not time_min:
             time_min = datetime.datetime.now().astimezone().isoformat()
@@ -142,7 +171,7 @@ class CalendarAgent:
         print(f"🔍 Searching for event '{summary}' after {time_min}...")
         try:
             # 1. Fetch candidates
-            events_result = self.service.events().list(
+            events_result = service.events().list(
                 calendarId='primary', timeMin=time_min, maxResults=20, singleEvents=True, orderBy='startTime'
             ).execute()
             events = events_result.get('items', [])
@@ -166,22 +195,23 @@ class CalendarAgent:
             The user wants to find an event {user_requirement}.
             
             Which event ID is the best match?
-            Return ONLY a JSON object with the "id" of the matching event, or null if no match found.
-            Example: {{ "id": "12345" }}
+            Return ONLY a JSON object with the "id" of the matching event, or null if no match found,
+            and your "confidence" (0.0 - 1.0) in that answer.
+            Example: {{ "id": "12345", "confidence": 0.9 }}
             """
             
-            # 3. Ask LLM
+            # 3. Ask LLM (small model, escalates to the large one on unknown IDs or low confidence)
             print(f"🤔 Asking LLM to match '{summary}'...")
-            response = self.client.chat.completions.create(
-                model=self.model_name,
+            event_ids = sorted({e['id'] for e in events})
+            content = self.llm.chat_json(
+                TASK_EVENT_MATCHING,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that matches events. Output JSON only."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"}
+                priority=PRIORITY_INTERACTIVE,
+                context={"event_ids": event_ids}
             )
-            
-            content = json.loads(response.choices[0].message.content)
             matched_id = content.get("id")
             
             if matched_id:
@@ -197,11 +227,18 @@ class CalendarAgent:
             print(f"❌ Search Error: {e}")
             return None
 
-    def execute_action(self, command_data: dict, auth_token: str = None, dry_run: bool = False):
+    def _require_confirmation(self, response: dict, command_data: dict, auth_token: str = None, resolved: dict = None):
+        """Stores a dry-run result and attaches the token needed to confirm it."""
+        response["confirmation_token"] = self.pending.put(command_data, resolved, owner=auth_token)
+        return response
+
+    def execute_action(self, command_data: dict, auth_token: str = None, dry_run: bool = False, resolved: dict = None):
         """
         Executes the action on Google Calendar based on the interpreted command.
         Uses auth_token if provided, otherwise falls back to local credentials (or simulation).
+        `resolved` carries event IDs already looked up during a dry run, so they are not searched again.
         """
+        resolved = resolved or {}
         intent = command_data.get("intent")
         event_data = command_data.get("event")
         
@@ -211,8 +248,9 @@ class CalendarAgent:
         if auth_token:
             try:
                 creds = Credentials(token=auth_token)
+                # Per request only: self.service stays the local (token.json) login,
+                # requests of different users run concurrently
                 service = build('calendar', 'v3', credentials=creds)
-                self.service = service # Update local service reference for _find_event
                 print("✅ Using provided User Token for Google Calendar")
             except Exception as e:
                 print(f"⚠️ Invalid User Token: {e}")
@@ -221,7 +259,10 @@ class CalendarAgent:
         # Simulation mode if no service
         if not service:
             if dry_run:
-                 return {"status": "confirmation_required", "message": f"[SIMULATION] Soll ich '{intent}' wirklich ausführen?", "data": event_data}
+                 return self._require_confirmation(
+                     {"status": "confirmation_required", "message": f"[SIMULATION] Soll ich '{intent}' wirklich ausführen?", "data": event_data},
+                     command_data, auth_token
+                 )
             
             if intent == "create_event":
                 return {
@@ -236,12 +277,12 @@ class CalendarAgent:
             # DRY RUN CHECK
             if dry_run:
                 if intent == "create_event":
-                    return {
+                    return self._require_confirmation({
                         "status": "confirmation_required", 
                         "message": f"Ich werde den Termin '{event_data.get('summary')}' erstellen. Einverstanden?",
                         "voice_message": f"Soll ich den Termin '{event_data.get('summary')}' erstellen?",
                         "data": event_data
-                    }
+                    }, command_data, auth_token)
                 elif intent == "delete_event":
                     if event_data.get('delete_all'):
                          # Batch delete dry run
@@ -249,7 +290,7 @@ class CalendarAgent:
                          time_max = event_data.get('timeMax')
                          if not time_min: time_min = datetime.datetime.now().astimezone().isoformat()
                          
-                         events_result = self.service.events().list(
+                         events_result = service.events().list(
                              calendarId='primary', timeMin=time_min, timeMax=time_max, singleEvents=True
                          ).execute()
                          events = events_result.get('items', [])
@@ -257,31 +298,31 @@ class CalendarAgent:
                          if not events:
                              return {"status": "error", "message": "Ich habe keine Termine in diesem Zeitraum gefunden."}
                              
-                         return {
+                         return self._require_confirmation({
                              "status": "confirmation_required",
                              "message": f"ACHTUNG: Ich werde ALLE {len(events)} Termine zwischen {time_min} und {time_max} löschen. Wirklich ausführen?",
                              "voice_message": f"Achtung. Ich werde {len(events)} Termine löschen. Bist du sicher?",
                              "data": event_data
-                         }
+                         }, command_data, auth_token, {"event_ids": [e['id'] for e in events]})
 
-                    target_event = self._find_event(event_data.get('summary'), event_data.get('timeMin'))
+                    target_event = self._find_event(service, event_data.get('summary'), event_data.get('timeMin'))
                     if target_event:
-                        return {
+                        return self._require_confirmation({
                             "status": "confirmation_required",
                             "message": f"Ich werde den Termin '{target_event.get('summary')}' ({target_event.get('start').get('dateTime')}) löschen. Einverstanden?",
                             "voice_message": f"Soll ich den Termin '{target_event.get('summary')}' wirklich löschen?",
                             "data": event_data
-                        }
+                        }, command_data, auth_token, {"event": target_event})
                     return {"status": "error", "message": f"Konnte Termin '{event_data.get('summary')}' nicht finden.", "voice_message": "Ich habe diesen Termin nicht gefunden."}
                 elif intent == "update_event":
-                    target_event = self._find_event(event_data.get('summary'), event_data.get('timeMin'))
+                    target_event = self._find_event(service, event_data.get('summary'), event_data.get('timeMin'))
                     if target_event:
-                         return {
+                         return self._require_confirmation({
                             "status": "confirmation_required",
                             "message": f"Ich werde den Termin '{target_event.get('summary')}' aktualisieren. Einverstanden?",
                             "voice_message": f"Soll ich den Termin '{target_event.get('summary')}' aktualisieren?",
                             "data": event_data
-                        }
+                        }, command_data, auth_token, {"event": target_event})
                     return {"status": "error", "message": f"Konnte Termin '{event_data.get('summary')}' nicht finden.", "voice_message": "Ich habe diesen Termin nicht gefunden."}
                 
                 return {"status": "success", "message": "Befehl verstanden (Dry Run).", "voice_message": "Verstanden."}
@@ -302,33 +343,35 @@ class CalendarAgent:
             elif intent == "delete_event":
                 if event_data.get('delete_all'):
                      # Batch delete execution
-                     time_min = event_data.get('timeMin')
-                     time_max = event_data.get('timeMax')
-                     if not time_min: time_min = datetime.datetime.now().astimezone().isoformat()
-
-                     events_result = service.events().list(
-                         calendarId='primary', timeMin=time_min, timeMax=time_max, singleEvents=True
-                     ).execute()
-                     events = events_result.get('items', [])
+                     event_ids = resolved.get('event_ids')
+                     if event_ids is None:
+                         time_min = event_data.get('timeMin')
+                         time_max = event_data.get('timeMax')
+                         if not time_min: time_min = datetime.datetime.now().astimezone().isoformat()
+
+                         events_result = service.events().list(
+                             calendarId='primary', timeMin=time_min, timeMax=time_max, singleEvents=True
+                         ).execute()
+                         event_ids = [e['id'] for e in events_result.get('items', [])]
                      
                      count = 0
-                     for e in events:
+                     for event_id in event_ids:
                          try:
-                             service.events().delete(calendarId='primary', eventId=e['id']).execute()
+                             service.events().delete(calendarId='primary', eventId=event_id).execute()
                              count += 1
                          except Exception as del_err:
-                             print(f"Error deleting event {e['id']}: {del_err}")
+                             print(f"Error deleting event {event_id}: {del_err}")
                              
                      return {"status": "success", "message": f"Es wurden {count} Termine gelöscht.", "voice_message": f"Ich habe {count} Termine gelöscht."}
 
-                target_event = self._find_event(event_data.get('summary'), event_data.get('timeMin'))
+                target_event = resolved.get('event') or self._find_event(service, event_data.get('summary'), event_data.get('timeMin'))
                 if target_event:
                     service.events().delete(calendarId='primary', eventId=target_event['id']).execute()
                     return {"status": "success", "message": f"Termin '{target_event.get('summary')}' wurde gelöscht.", "voice_message": "Der Termin wurde gelöscht."}
                 return {"status": "error", "message": f"Konnte Termin '{event_data.get('summary')}' nicht finden.", "voice_message": "Ich konnte den Termin nicht finden."}
 
             elif intent == "update_event":
-                target_event = self._find_event(event_data.get('summary'), event_data.get('timeMin'))
+                target_event = resolved.get('event') or self._find_event(service, event_data.get('summary'), event_data.get('timeMin'))
                 if target_event:
                     # Merge new data
                     updated_event = {**target_event, **event_data}
@@ -391,3 +434,18 @@ class CalendarAgent:
         # 2. Execute
         result = self.execute_action(interpretation, auth_token, dry_run)
         return result
+
+    def confirm(self, confirmation_token: str, auth_token: str = None):
+        """Executes a previously dry-run command directly from the pending store."""
+        # Only the Google login that requested the dry run may confirm it
+        pending = self.pending.pop(confirmation_token, owner=auth_token)
+        if not pending:
+            return {
+                "status": "error",
+                "code": "confirmation_expired",
+                "message": "Die Bestätigung ist abgelaufen. Bitte den Befehl erneut senden.",
+                "voice_message": "Die Bestätigung ist abgelaufen."
+            }
+
+        print(f"✅ Confirmed pending command: {pending['command'].get('intent')}")
+        return self.execute_action(pending["command"], auth_token, dry_run=False, resolved=pending["resolved"])
@@ -0,0 +1,110 @@
+import numpy as np
+
+SAMPLE_RATE = 16000  # Whisper's native input rate
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """Downmixes (samples, channels) or (channels, samples) audio to mono."""
+    if audio.ndim == 1:
+        return audio
+    # Channels are the short axis
+    channel_axis = 0 if audio.shape[0] < audio.shape[1] else 1
+    return audio.mean(axis=channel_axis)
+
+
+def resample(audio: np.ndarray, sample_rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Linear-interpolation resampling (sufficient for speech going into Whisper)."""
+    if sample_rate == target_rate or len(audio) == 0:
+        return audio
+    target_length = int(round(len(audio) * target_rate / sample_rate))
+    positions = np.linspace(0, len(audio) - 1, target_length)
+    return np.interp(positions, np.arange(len(audio)), audio)
+
+
+def frame_rms(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30) -> np.ndarray:
+    """RMS level per frame (trailing partial frame is ignored)."""
+    frame_length = sample_rate * frame_ms // 1000
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:frame_count * frame_length].reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 30,
+    min_level: float = 0.01,
+    noise_factor: float = 3.0,
+    peak_ratio: float = 0.5,
+    edge_ms: int = 150,
+    padding_ms: int = 200,
+):
+    """
+    Energy gate on peak-normalized audio: cuts leading/trailing frames below the threshold.
+    The noise floor comes from the quieter of the leading/trailing frames (or the 10th percentile
+    if lower). The threshold is `noise_factor` x noise floor, but never above `peak_ratio` x the
+    loudest frame (so recordings filled with speech are kept) and never below `min_level`.
+    Returns (trimmed audio, speech duration in seconds).
+    """
+    rms = frame_rms(audio, sample_rate, frame_ms)
+    if len(rms) == 0:
+        return audio[:0], 0
+
+    edge_frames = max(1, edge_ms // frame_ms)
+    edge_floor = min(np.median(rms[:edge_frames]), np.median(rms[-edge_frames:]))
+    noise_floor = min(edge_floor, np.percentile(rms, 10))
+    threshold = max(min_level, min(noise_factor * noise_floor, peak_ratio * rms.max()))
+
+    speech = np.flatnonzero(rms > threshold)
+    if len(speech) == 0:
+        return audio[:0], 0
+
+    frame_length = sample_rate * frame_ms // 1000
+    padding = padding_ms * sample_rate // 1000
+    start = max(0, speech[0] * frame_length - padding)
+    end = min(len(audio), (speech[-1] + 1) * frame_length + padding)
+    return audio[start:end], len(speech) * frame_ms / 1000
+
+
+def normalize(audio: np.ndarray, peak: float = 0.95) -> np.ndarray:
+    """Peak-normalizes so the gate and Whisper see a consistent level, independent of mic gain."""
+    max_value = np.max(np.abs(audio)) if len(audio) else 0.0
+    if max_value == 0:
+        return audio
+    return audio * (peak / max_value)
+
+
+def preprocess(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, min_speech_ms: int = 300, silence_level: float = 0.002):
+    """
+    Downmix -> resample to 16 kHz -> normalize -> trim silence.
+    Recordings whose loudest frame stays below `silence_level` (raw, about -54 dBFS: an
+    accidental tap with only mic hiss) or with less than `min_speech_ms` above the gate
+    count as empty.
+    Returns (float32 audio ready for Whisper or None if no speech, stats dict).
+    """
+    audio = resample(to_mono(np.asarray(audio, dtype=np.float32)), sample_rate)
+    original_duration = len(audio) / SAMPLE_RATE
+    stats = {"original_duration": round(original_duration, 2), "trimmed_duration": 0.0}
+
+    rms = frame_rms(audio)
+    if len(rms) == 0 or rms.max() < silence_level:
+        return None, stats
+
+    trimmed, speech_duration = trim_silence(normalize(audio))
+    stats["trimmed_duration"] = round(len(trimmed) / SAMPLE_RATE, 2)
+
+    if speech_duration * 1000 < min_speech_ms:
+        return None, stats
+
+    return trimmed.astype(np.float32), stats
+
+
+def load_and_preprocess(path: str):
+    """Decodes any container (webm/ogg/wav, 48 kHz stereo, ...) straight to 16 kHz mono and preprocesses it."""
+    # Imported here so the NumPy stage itself does not depend on faster-whisper
+    from faster_whisper import decode_audio
+
+    audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+    return preprocess(audio, SAMPLE_RATE)
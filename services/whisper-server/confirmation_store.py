@@ -0,0 +1,57 @@
+import hashlib
+import secrets
+import threading
+import time
+
+
+class PendingConfirmationStore:
+    """
+    Short-lived in-memory store for dry-run results awaiting user confirmation.
+    Keeps the interpretation plus the already resolved event IDs under a random token,
+    so confirming does not have to re-run the LLM calls and calendar lookups.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _owner_hash(owner: str = None) -> str:
+        # Never keep raw auth tokens around
+        return hashlib.sha256((owner or "").encode()).hexdigest()
+
+    def put(self, command: dict, resolved: dict = None, owner: str = None) -> str:
+        """Stores a pending command for `owner` (the dry run's auth token) and returns its confirmation token."""
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._evict_expired()
+            # Drop the oldest entries if the store is full (dicts keep insertion order)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[token] = {
+                "command": command,
+                "resolved": resolved or {},
+                "owner": self._owner_hash(owner),
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+        return token
+
+    def pop(self, token: str, owner: str = None):
+        """
+        Removes and returns a pending entry, or None if unknown, expired or
+        requested by someone other than its owner (the entry is kept then).
+        """
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(token)
+            if entry is None or not secrets.compare_digest(entry["owner"], self._owner_hash(owner)):
+                return None
+            return self._entries.pop(token)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [t for t, entry in self._entries.items() if entry["expires_at"] <= now]
+        for t in expired:
+            del self._entries[t]
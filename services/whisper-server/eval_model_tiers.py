@@ -0,0 +1,112 @@
+"""
+Offline comparison of small vs. large model on recorded LLM task samples.
+
+Record samples by starting the server with LLM_SAMPLE_LOG set, e.g.
+    export LLM_SAMPLE_LOG=llm_samples.jsonl
+then replay them against both tiers:
+    python eval_model_tiers.py llm_samples.jsonl
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from dotenv import load_dotenv
+from llm_manager import LLMManager, PRIORITY_BACKGROUND, TASK_MAIL_CLASSIFICATION, TASK_EVENT_MATCHING
+
+# Fields that have to match for two answers to count as "agreeing"
+COMPARED_FIELDS = {
+    TASK_MAIL_CLASSIFICATION: ["is_relevant", "category"],
+    TASK_EVENT_MATCHING: ["id"],
+}
+
+
+def answers_agree(task: str, small: dict, large: dict) -> bool:
+    if small is None or large is None:
+        return False
+    fields = COMPARED_FIELDS[task]
+    # The category of irrelevant mail is never used, so it does not count as disagreement
+    if task == TASK_MAIL_CLASSIFICATION and small.get("is_relevant") is False and large.get("is_relevant") is False:
+        fields = ["is_relevant"]
+    return all(small.get(k) == large.get(k) for k in fields)
+
+
+def load_samples(path: str, task: str = None, limit: int = None):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            sample = json.loads(line)
+            if sample.get("task") not in COMPARED_FIELDS:
+                continue
+            if task and sample["task"] != task:
+                continue
+            samples.append(sample)
+    return samples[:limit] if limit else samples
+
+
+def run_tier(llm: LLMManager, model: str, messages: list):
+    """Returns (parsed JSON or None, latency in seconds) without escalation."""
+    start_time = time.time()
+    try:
+        result = llm.complete_json(model, messages, priority=PRIORITY_BACKGROUND)
+    except Exception as e:
+        print(f"⚠️ {model}: {e}")
+        result = None
+    return result, time.time() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare small and large model tiers on recorded samples.")
+    parser.add_argument("samples", help="JSONL file written via LLM_SAMPLE_LOG")
+    parser.add_argument("--task", choices=sorted(COMPARED_FIELDS), help="Only evaluate one task")
+    parser.add_argument("--limit", type=int, help="Maximum number of samples")
+    parser.add_argument("--min-confidence", type=float, default=0.6, help="Escalation threshold used by the server")
+    args = parser.parse_args()
+
+    load_dotenv()
+    llm = LLMManager()
+    samples = load_samples(args.samples, args.task, args.limit)
+    if not samples:
+        print("No samples found.")
+        return
+    if any(sample.get("context") is None for sample in samples):
+        print("⚠️ Some samples were recorded without context, their candidate IDs/categories are not checked.")
+
+    stats = defaultdict(lambda: defaultdict(float))
+    for i, sample in enumerate(samples, 1):
+        task = sample["task"]
+        small_model = llm.model_for(task)
+        small, small_time = run_tier(llm, small_model, sample["messages"])
+        large, large_time = run_tier(llm, llm.model_name, sample["messages"])
+
+        agree = answers_agree(task, small, large)
+        # Same checks as chat_json: validator on the recorded candidates/categories + confidence
+        validate = llm.validator_for(task, sample.get("context"))
+        escalate = not llm.is_acceptable(small, validate, args.min_confidence)
+
+        s = stats[task]
+        s["count"] += 1
+        s["agree"] += agree
+        s["invalid_small"] += small is None
+        s["escalated"] += escalate
+        # Agreement after escalation = what the server would actually return
+        s["agree_routed"] += agree or escalate
+        s["time_small"] += small_time
+        s["time_large"] += large_time
+        print(f"[{i}/{len(samples)}] {task}: {'✅' if agree else '❌'} small={small_time:.2f}s large={large_time:.2f}s")
+
+    print("\n📊 Results")
+    for task, s in stats.items():
+        n = s["count"]
+        print(f"\n{task} ({llm.model_for(task)} vs. {llm.model_name}), {int(n)} samples")
+        print(f"  Agreement:               {s['agree'] / n:.1%}")
+        print(f"  Agreement with escalate: {s['agree_routed'] / n:.1%}")
+        print(f"  Escalation rate:         {s['escalated'] / n:.1%}")
+        print(f"  Invalid small outputs:   {s['invalid_small'] / n:.1%}")
+        print(f"  Avg latency small/large: {s['time_small'] / n:.2f}s / {s['time_large'] / n:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
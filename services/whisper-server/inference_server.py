@@ -0,0 +1,93 @@
+"""
+Dedicated inference process for the multi-worker production mode.
+
+Loads the Whisper model exactly once and shares it (plus the state that has to be
+the same for every API worker) over a local IPC connection:
+- transcriber: Whisper transcription
+- pending:     confirmation store, so a dry run and its confirmation may hit different workers
+- llm_gate:    LLM priority gate, so voice commands keep precedence over mail scans across workers
+
+Start:  python inference_server.py   (see start.sh --prod)
+"""
+import os
+import signal
+import ipaddress
+from multiprocessing.managers import BaseManager
+from dotenv import load_dotenv
+
+
+class InferenceManager(BaseManager):
+    pass
+
+
+def _address():
+    host, _, port = os.environ.get("INFERENCE_ADDRESS", "127.0.0.1:9100").rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def _authkey():
+    """
+    The manager exchanges pickles, so whoever knows the key can run code in the
+    inference process. The built-in fallback key is only accepted on loopback.
+    """
+    key = os.environ.get("INFERENCE_AUTHKEY")
+    if key:
+        return key.encode()
+
+    host = _address()[0]
+    try:
+        loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise RuntimeError(f"INFERENCE_AUTHKEY must be set when the inference process listens on {host}")
+
+    print("⚠️ INFERENCE_AUTHKEY not set, using the default key (loopback only)")
+    return b"cal-speak-buddy"
+
+
+def connect():
+    """Connects an API worker to the running inference process. Raises if it is not reachable."""
+    for name in ("transcriber", "pending", "llm_gate"):
+        InferenceManager.register(name)
+    manager = InferenceManager(address=_address(), authkey=_authkey())
+    manager.connect()
+    return manager
+
+
+def serve():
+    load_dotenv()
+
+    # Imported here so API workers that only connect() never load the model
+    from transcriber import Transcriber
+    from confirmation_store import PendingConfirmationStore
+    from llm_manager import LLMManager, PriorityGate
+
+    transcriber = Transcriber()
+    pending = PendingConfirmationStore(ttl_seconds=300)
+    # Leases expire, so a worker killed mid-call cannot block the gate for everyone
+    llm_gate = PriorityGate(lease_seconds=300)
+
+    # One warm-up/keep-alive loop for all workers
+    LLMManager(gate=llm_gate).start()
+
+    InferenceManager.register("transcriber", callable=lambda: transcriber)
+    InferenceManager.register("pending", callable=lambda: pending)
+    InferenceManager.register("llm_gate", callable=lambda: llm_gate)
+
+    manager = InferenceManager(address=_address(), authkey=_authkey())
+    server = manager.get_server()
+
+    def shutdown(signum, frame):
+        print("🛑 Inference process shutting down...")
+        server.stop_event.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"✅ Inference process ready on {server.address[0]}:{server.address[1]} (pid {os.getpid()})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
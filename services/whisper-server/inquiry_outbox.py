@@ -0,0 +1,255 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from postgrest.exceptions import APIError
+
+# Delivery failure kinds, see InquiryOutbox._classify
+TRANSIENT = "transient"  # network/5xx: retry later
+SYSTEMIC = "systemic"    # hits every row (schema, auth): fix the setup, rows stay pending
+REJECTED = "rejected"    # Supabase refused these rows (constraint, bad data)
+
+# Postgres/PostgREST codes that no row can pass: missing unique index for ON CONFLICT
+# (migration not applied), unknown table/column, privileges/RLS, JWT problems (PGRST3xx)
+SYSTEMIC_CODES = {"42P10", "42P01", "42703", "42501", "PGRST106", "PGRST204", "PGRST205"}
+SYSTEMIC_CODE_PREFIXES = ("PGRST3", "28")
+
+
+class InquiryOutbox:
+    """
+    Durable local outbox (SQLite) for inquiries created by the MailAgent.
+    Emails are written here first and flushed to Supabase in bulk, so a slow or
+    failing Supabase never stalls a scan or forces emails through the LLM again.
+    Rows are keyed by an idempotency key (e.g. 'gmail:<message id>').
+    Rows Supabase keeps rejecting (e.g. constraint violations) are isolated and,
+    after `max_row_attempts` flushes, moved to status 'failed' (dead letter);
+    requeue_failed() puts them back. Errors that would hit every row (missing
+    migration, RLS/JWT) stop the flush and leave everything pending.
+    """
+
+    def __init__(self, path: str = None, batch_size: int = 50, max_attempts: int = 3, backoff_seconds: float = 0.5, max_row_attempts: int = 3):
+        self.path = path or os.environ.get(
+            "INQUIRY_OUTBOX_PATH",
+            os.path.join(os.path.dirname(__file__), "inquiry_outbox.db")
+        )
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_row_attempts = max_row_attempts
+        self._lock = threading.Lock()
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    idempotency_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    sent_at REAL
+                )
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """Opens a connection, commits (or rolls back) and always closes it."""
+        with self._lock, closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    def contains(self, key: str) -> bool:
+        """True if this key was already queued or sent (no need to analyze the email again)."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT 1 FROM outbox WHERE idempotency_key = ?", (key,)).fetchone()
+        return row is not None
+
+    def enqueue(self, key: str, data: dict):
+        """Stores an inquiry durably. Enqueuing the same key twice is a no-op."""
+        payload = {**data, "idempotency_key": key}
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, payload, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+
+    def pending_count(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def flush(self, supabase) -> dict:
+        """
+        Sends all pending inquiries to Supabase in bulk (one request per batch).
+        Connection problems are retried with exponential backoff; if they persist, or
+        Supabase reports a setup problem, flushing stops and everything stays pending.
+        A batch Supabase rejects is split up to isolate the offending rows.
+        """
+        sent = 0
+        # Rows rejected during this flush are not picked up again until the next one
+        rejected_keys = []
+        while True:
+            placeholders = ",".join("?" * len(rejected_keys))
+            with self._transaction() as conn:
+                rows = conn.execute(
+                    f"""SELECT idempotency_key, payload FROM outbox
+                        WHERE status = 'pending' AND idempotency_key NOT IN ({placeholders})
+                        ORDER BY created_at LIMIT ?""",
+                    (*rejected_keys, self.batch_size)
+                ).fetchall()
+            if not rows:
+                break
+
+            sent_keys, rejected, failure = self._deliver(supabase, [(key, json.loads(payload)) for key, payload in rows])
+
+            with self._transaction() as conn:
+                if sent_keys:
+                    placeholders = ",".join("?" * len(sent_keys))
+                    conn.execute(
+                        f"UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE idempotency_key IN ({placeholders})",
+                        (time.time(), *sent_keys)
+                    )
+                for key, error in rejected.items():
+                    conn.execute(
+                        """UPDATE outbox SET attempts = attempts + 1, last_error = ?,
+                           status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END
+                           WHERE idempotency_key = ?""",
+                        (error, self.max_row_attempts, key)
+                    )
+            sent += len(sent_keys)
+            rejected_keys += rejected.keys()
+
+            if failure is not None:
+                kind, code, message = failure
+                if kind == SYSTEMIC:
+                    print(f"❌ Supabase rejects every inquiry ({code}), keeping them pending: {message}")
+                # Transient: Supabase is most likely unavailable, don't hammer it with the remaining batches
+                break
+
+        with self._transaction() as conn:
+            dead = conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'failed'").fetchone()[0]
+        pending = self.pending_count()
+        if sent or pending or rejected_keys:
+            print(f"📤 Outbox flush: {sent} sent, {len(rejected_keys)} rejected, {pending} still pending, {dead} dead-lettered")
+        return {"sent": sent, "pending": pending, "failed": dead}
+
+    def requeue_failed(self, keys: list = None) -> int:
+        """Moves dead-lettered rows (all, or the given keys) back to pending. Returns the number of rows."""
+        query = "UPDATE outbox SET status = 'pending', attempts = 0 WHERE status = 'failed'"
+        params = ()
+        if keys:
+            query += f" AND idempotency_key IN ({','.join('?' * len(keys))})"
+            params = tuple(keys)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    def _deliver(self, supabase, rows: list):
+        """
+        Inserts (key, payload) rows. Returns (sent keys, {key: error} for rows Supabase
+        rejected, (kind, code, message) of a transient/systemic failure or None).
+        """
+        failure = self._insert_with_retry(supabase, [payload for _, payload in rows])
+        if failure is None:
+            return [key for key, _ in rows], {}, None
+        return self._isolate(supabase, rows, failure)
+
+    def _isolate(self, supabase, rows: list, failure: tuple):
+        """Bisects a batch that failed with `failure` down to the rows Supabase rejects."""
+        kind, code, message = failure
+        if kind != REJECTED:
+            return [], {}, failure
+        if len(rows) == 1:
+            print(f"⚠️ Supabase rejected inquiry {rows[0][0]}: {message}")
+            return [], {rows[0][0]: message}, None
+
+        middle = len(rows) // 2
+        halves = (rows[:middle], rows[middle:])
+        failures = []
+        for half in halves:
+            half_failure = self._insert_with_retry(supabase, [payload for _, payload in half])
+            if half_failure is not None and half_failure[0] != REJECTED:
+                # Rows of the first half may already be stored, the upsert makes resending them harmless
+                return [], {}, half_failure
+            failures.append(half_failure)
+
+        if all(failures) and failures[0][1] == failures[1][1] and self._rejects_everything(supabase, halves, failures[0]):
+            # Same error everywhere: not a bad row, but something every row runs into
+            return [], {}, (SYSTEMIC, code, message)
+
+        sent_keys = []
+        rejected = {}
+        for half, half_failure in zip(halves, failures):
+            if half_failure is None:
+                sent_keys += [key for key, _ in half]
+                continue
+            half_sent, half_rejected, stop = self._isolate(supabase, half, half_failure)
+            sent_keys += half_sent
+            rejected.update(half_rejected)
+            if stop is not None:
+                return sent_keys, rejected, stop
+        return sent_keys, rejected, None
+
+    def _rejects_everything(self, supabase, halves: tuple, failure: tuple) -> bool:
+        """
+        Both halves failed with the same code: probes the first row of each half on its own.
+        If both are rejected the same way too, bisecting further would only repeat the error.
+        Single-row halves are already conclusive (they are handled as rejected rows).
+        """
+        if len(halves[0]) == 1 and len(halves[1]) == 1:
+            return False
+        for half in halves:
+            probe = self._insert_with_retry(supabase, [half[0][1]])
+            if probe is None or probe[0] != REJECTED or probe[1] != failure[1]:
+                return False
+        return True
+
+    @staticmethod
+    def _classify(error: Exception):
+        """Returns (kind, code) for a failed insert, see TRANSIENT/SYSTEMIC/REJECTED."""
+        if not isinstance(error, APIError):
+            return TRANSIENT, None
+        code = str(error.code or "")
+        if not code or code.startswith("5"):
+            return TRANSIENT, code or None
+        if code in SYSTEMIC_CODES or code.startswith(SYSTEMIC_CODE_PREFIXES):
+            return SYSTEMIC, code
+        return REJECTED, code
+
+    def _insert_with_retry(self, supabase, batch: list):
+        """Returns None on success, otherwise (kind, code, message) of the last error."""
+        failure = None
+        for attempt in range(self.max_attempts):
+            try:
+                # Upsert on the idempotency key: a batch that reached Supabase before
+                # a timeout can be resent without creating duplicate tickets
+                supabase.table("inquiries").upsert(
+                    batch, on_conflict="idempotency_key", ignore_duplicates=True
+                ).execute()
+                return None
+            except Exception as e:
+                kind, code = self._classify(e)
+                failure = (kind, code, str(e))
+                if kind != TRANSIENT:
+                    return failure
+                print(f"⚠️ Bulk insert failed (attempt {attempt + 1}/{self.max_attempts}): {e}")
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self.backoff_seconds * (2 ** attempt))
+        return failure
+
+    def prune(self, max_age_days: int = 30):
+        """Removes sent entries older than max_age_days."""
+        cutoff = time.time() - max_age_days * 86400
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-drive dead-lettered inquiries of the local outbox.")
+    parser.add_argument("keys", nargs="*", help="Idempotency keys to requeue (default: all failed rows)")
+    args = parser.parse_args()
+
+    outbox = InquiryOutbox()
+    count = outbox.requeue_failed(args.keys)
+    print(f"♻️ {count} inquiries requeued, {outbox.pending_count()} pending (sent with the next mail scan)")
@@ -0,0 +1,266 @@
+import os
+import json
+import heapq
+import itertools
+import threading
+import time
+import httpx
+from openai import OpenAI
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Tasks with their own model configuration
+TASK_INTENT = "intent"
+TASK_MAIL_CLASSIFICATION = "mail_classification"
+TASK_EVENT_MATCHING = "event_matching"
+
+
+def _valid_mail_classification(result: dict, context: dict) -> bool:
+    """Category only matters for relevant mail (irrelevant mail is never stored)."""
+    if not isinstance(result.get("is_relevant"), bool):
+        return False
+    return not result["is_relevant"] or result.get("category") in context["categories"]
+
+
+def _valid_event_match(result: dict, context: dict) -> bool:
+    """The matched ID has to be one of the candidate events (or null for no match)."""
+    return result.get("id") is None or result.get("id") in context["event_ids"]
+
+
+# Checks a small-model answer has to pass, given the request's context (candidate IDs,
+# allowed categories). The context is recorded with each sample, so eval_model_tiers.py
+# replays the same decision.
+TASK_VALIDATORS = {
+    TASK_MAIL_CLASSIFICATION: _valid_mail_classification,
+    TASK_EVENT_MATCHING: _valid_event_match,
+}
+
+
+class PriorityGate:
+    """
+    One LLM request at a time, ordered by priority then arrival.
+    The holder gets a lease: if it never releases (e.g. a worker process was killed
+    during a slow call), the lease expires after `lease_seconds` and the next request proceeds.
+    """
+
+    def __init__(self, lease_seconds: float = 300):
+        self.lease_seconds = lease_seconds
+        self._condition = threading.Condition()
+        self._queue = []
+        self._holder = None  # (lease id, expires at)
+        self._counter = itertools.count()
+
+    def acquire(self, priority: int) -> int:
+        """Blocks until it is this request's turn and returns the lease id for release()."""
+        with self._condition:
+            entry = (priority, next(self._counter))
+            heapq.heappush(self._queue, entry)
+            while True:
+                self._expire_lease()
+                if self._holder is None and self._queue[0] == entry:
+                    break
+                # Wake up regularly so an abandoned lease is noticed
+                self._condition.wait(timeout=1.0)
+            heapq.heappop(self._queue)
+            lease = entry[1]
+            self._holder = (lease, time.monotonic() + self.lease_seconds)
+            return lease
+
+    def release(self, lease: int):
+        with self._condition:
+            # Ignore releases of leases that already expired (someone else may hold the gate now)
+            if self._holder and self._holder[0] == lease:
+                self._holder = None
+                self._condition.notify_all()
+
+    def _expire_lease(self):
+        if self._holder and time.monotonic() >= self._holder[1]:
+            print(f"⚠️ LLM lease {self._holder[0]} expired without release, freeing the gate")
+            self._holder = None
+
+    def is_busy(self) -> bool:
+        return self._holder is not None
+
+
+class LLMManager:
+    """
+    Shared access to the local Ollama instance for all agents.
+    - One OpenAI-compatible client instead of one per agent
+    - Warm-up at startup and a keep-warm loop so the model stays resident (no cold start)
+    - Priority gate: interactive voice commands are served before background mail classification
+      (pass a shared `gate` so the priority holds across several API worker processes)
+    - Per-task models: simple tasks run on a small model and escalate to the large one if unsure
+    """
+
+    def __init__(self, model_name: str = "qwen2.5:14b", keep_alive: str = "30m", keep_warm_interval: int = 60, gate=None):
+        self.host = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+        self.client = OpenAI(
+            base_url=f"{self.host}/v1",
+            api_key="ollama"
+        )
+        self.model_name = model_name
+        # Free-form intent extraction needs the large model, classification/matching do not
+        self.task_models = {
+            TASK_INTENT: os.environ.get("LLM_MODEL_INTENT", model_name),
+            TASK_MAIL_CLASSIFICATION: os.environ.get("LLM_MODEL_MAIL", "qwen2.5:3b"),
+            TASK_EVENT_MATCHING: os.environ.get("LLM_MODEL_MATCHING", "qwen2.5:3b"),
+        }
+        # keep_alive per model (Ollama duration string, "-1" = never unload)
+        self.keep_alive = {model: keep_alive for model in [model_name, *self.task_models.values()]}
+        # Optional JSONL log of task prompts/outputs for offline tier evaluation (eval_model_tiers.py)
+        self.sample_log = os.environ.get("LLM_SAMPLE_LOG")
+        self._sample_lock = threading.Lock()
+        self.keep_warm_interval = keep_warm_interval
+        self.resident = {}
+
+        self.gate = gate if gate is not None else PriorityGate()
+        self._stop = threading.Event()
+        self._keep_warm_thread = None
+
+    def start(self):
+        """Warms up all configured models and keeps them resident in the background."""
+        if self._keep_warm_thread:
+            return
+        self._keep_warm_thread = threading.Thread(target=self._keep_warm_loop, name="llm-keep-warm", daemon=True)
+        self._keep_warm_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def warm_up(self, model: str = None):
+        """
+        Loads a model into memory (empty generate request) with its keep_alive policy.
+        Holds the gate at background priority, so a (cold) reload never runs alongside a command.
+        """
+        model = model or self.model_name
+        lease = self.gate.acquire(PRIORITY_BACKGROUND)
+        start_time = time.time()
+        try:
+            response = httpx.post(
+                f"{self.host}/api/generate",
+                json={"model": model, "keep_alive": self.keep_alive.get(model, "5m")},
+                timeout=300
+            )
+            response.raise_for_status()
+            self.resident[model] = True
+            print(f"🔥 Model '{model}' warm ({time.time() - start_time:.1f}s)")
+        except Exception as e:
+            self.resident[model] = False
+            print(f"⚠️ Warm-up of '{model}' failed: {e}")
+        finally:
+            self.gate.release(lease)
+
+    def refresh_residency(self):
+        """Updates `resident` from Ollama's list of currently loaded models."""
+        try:
+            response = httpx.get(f"{self.host}/api/ps", timeout=5)
+            response.raise_for_status()
+            loaded = {m.get("name") for m in response.json().get("models", [])}
+        except Exception as e:
+            print(f"⚠️ Could not query Ollama residency: {e}")
+            return self.resident
+        for model in self.keep_alive:
+            self.resident[model] = model in loaded
+        return self.resident
+
+    def is_resident(self, model: str = None) -> bool:
+        return self.resident.get(model or self.model_name, False)
+
+    def _keep_warm_loop(self):
+        for model in self.keep_alive:
+            self.warm_up(model)
+        while not self._stop.wait(self.keep_warm_interval):
+            self.refresh_residency()
+            # Chat calls via the OpenAI API reset keep_alive to Ollama's default,
+            # so re-apply our policy regularly (cheap when the model is already loaded).
+            for model in self.keep_alive:
+                # Skip a round instead of queueing keep-alives behind running requests
+                if not self.gate.is_busy():
+                    self.warm_up(model)
+
+    def chat(self, messages: list, model: str = None, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Runs a chat completion once all higher-priority requests are done."""
+        model = model or self.model_name
+        lease = self.gate.acquire(priority)
+        try:
+            # Residency is only tracked by the manager running the keep-warm loop
+            # (in production mode that is the inference process, not the API workers)
+            if self._keep_warm_thread and not self.is_resident(model):
+                print(f"🥶 Model '{model}' not resident, expect a cold start...")
+            response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            self.resident[model] = True
+            return response
+        finally:
+            self.gate.release(lease)
+
+    def model_for(self, task: str) -> str:
+        return self.task_models.get(task, self.model_name)
+
+    def chat_json(self, task: str, messages: list, priority: int = PRIORITY_INTERACTIVE, context: dict = None, min_confidence: float = 0.6):
+        """
+        Runs a JSON task on its configured model. If a smaller model returns invalid JSON,
+        fails the task's validator (see TASK_VALIDATORS, checked against `context`) or
+        reports a confidence below `min_confidence`, the request is escalated to the
+        large model. Returns the parsed JSON object.
+        """
+        model = self.model_for(task)
+        validate = self.validator_for(task, context)
+        result = None
+        try:
+            result = self.complete_json(model, messages, priority)
+        except Exception as e:
+            if model == self.model_name:
+                raise
+            print(f"⚠️ Model '{model}' failed for '{task}': {e}")
+
+        if model != self.model_name and not self.is_acceptable(result, validate, min_confidence):
+            print(f"⬆️ Escalating '{task}' from '{model}' to '{self.model_name}'")
+            model = self.model_name
+            result = self.complete_json(model, messages, priority)
+
+        if result is None:
+            raise ValueError(f"Model '{model}' returned invalid JSON for '{task}'")
+
+        self._record_sample(task, messages, model, result, context)
+        return result
+
+    @staticmethod
+    def validator_for(task: str, context: dict = None):
+        """The task's validator bound to `context`, or None if there is nothing to check."""
+        validator = TASK_VALIDATORS.get(task)
+        if validator is None or context is None:
+            return None
+        return lambda result: validator(result, context)
+
+    def complete_json(self, model: str, messages: list, priority: int):
+        """Single JSON completion on `model` without escalation. Returns the parsed object or None."""
+        response = self.chat(messages, model=model, priority=priority, response_format={"type": "json_object"})
+        try:
+            result = json.loads(response.choices[0].message.content)
+        except (TypeError, json.JSONDecodeError):
+            return None
+        return result if isinstance(result, dict) else None
+
+    def is_acceptable(self, result, validate, min_confidence: float) -> bool:
+        """True if a small-model answer can be used as is (otherwise chat_json escalates)."""
+        if result is None:
+            return False
+        if validate and not validate(result):
+            return False
+        confidence = result.get("confidence")
+        if isinstance(confidence, (int, float)) and confidence < min_confidence:
+            return False
+        return True
+
+    def _record_sample(self, task: str, messages: list, model: str, output: dict, context: dict = None):
+        if not self.sample_log:
+            return
+        sample = {"task": task, "model": model, "messages": messages, "output": output, "context": context}
+        line = json.dumps(sample, ensure_ascii=False)
+        try:
+            with self._sample_lock, open(self.sample_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write LLM sample: {e}")
@@ -2,26 +2,26 @@ import os
 import base64
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-from openai import OpenAI
 import json
 from supabase import create_client, Client
 from email.utils import parseaddr
+from llm_manager import LLMManager, PRIORITY_BACKGROUND, TASK_MAIL_CLASSIFICATION
+from inquiry_outbox import InquiryOutbox
+
+CATEGORIES = ["general", "appointment", "technical", "billing", "complaint"]
 
 from dotenv import load_dotenv
 
 class MailAgent:
-    def __init__(self):
+    def __init__(self, llm: LLMManager = None):
         # Load env explicitly
         env_path = os.path.join(os.path.dirname(__file__), '.env')
         print(f"DEBUG: Loading env from {env_path}")
         load_dotenv(env_path)
 
-        # Initialize Local LLM (Ollama)
-        self.client = OpenAI(
-            base_url="http://localhost:11434/v1",
-            api_key="ollama" 
-        )
-        self.model_name = "qwen2.5:14b"
+        # Local LLM (Ollama), shared with other agents when provided
+        self.llm = llm or LLMManager()
+        self.model_name = self.llm.model_for(TASK_MAIL_CLASSIFICATION)
         
         # Initialize Supabase
         url = os.environ.get("SUPABASE_URL") or os.environ.get("VITE_SUPABASE_URL")
@@ -37,6 +37,9 @@ class MailAgent:
             self.supabase: Client = create_client(url, key)
             print("✅ Supabase Client initialized in MailAgent")
 
+        # Local outbox: inquiries are stored durably first and bulk-inserted into Supabase
+        self.outbox = InquiryOutbox()
+
     def scan_and_process(self, auth_token: str, user_id: str):
         """
         Scans unread emails and converts them to tickets.
@@ -58,9 +61,19 @@ class MailAgent:
             skipped_count = 0
             
             if not messages:
-                return {"status": "success", "count": 0, "message": "No unread emails found."}
+                # Still deliver inquiries left over from earlier scans
+                flush_result = self.outbox.flush(self.supabase)
+                return {"status": "success", "count": 0, "pending": flush_result["pending"], "message": "No unread emails found."}
 
             for msg in messages:
+                idempotency_key = f"gmail:{msg['id']}"
+                
+                # Already queued by an earlier scan (e.g. marking as read failed) -> no new LLM call
+                if self.outbox.contains(idempotency_key):
+                    print(f"↩️ Already in outbox: {msg['id']}")
+                    service.users().messages().modify(userId='me', id=msg['id'], body={'removeLabelIds': ['UNREAD']}).execute()
+                    continue
+
                 # Get full message details
                 message = service.users().messages().get(userId='me', id=msg['id']).execute()
                 payload = message['payload']
@@ -93,7 +106,7 @@ class MailAgent:
                     skipped_count += 1
                     continue
 
-                # 5. Save to Supabase
+                # 5. Queue for Supabase (durable, flushed in bulk below)
                 data = {
                     "user_id": user_id,
                     "name": sender_name or "Email User",
@@ -105,15 +118,18 @@ class MailAgent:
                     "source": "email"
                 }
 
-                print(f"📝 Inserting into Supabase: {subject}")
-                self.supabase.table("inquiries").insert(data).execute()
-                print("✅ Insert successful")
+                print(f"📝 Queueing inquiry: {subject}")
+                self.outbox.enqueue(idempotency_key, data)
                 
                 # 6. Mark as read
                 service.users().messages().modify(userId='me', id=msg['id'], body={'removeLabelIds': ['UNREAD']}).execute()
                 processed_count += 1
+            
+            # 7. Bulk insert everything queued (including leftovers from earlier scans)
+            flush_result = self.outbox.flush(self.supabase)
+            self.outbox.prune()
                 
-            return {"status": "success", "count": processed_count, "skipped": skipped_count}
+            return {"status": "success", "count": processed_count, "skipped": skipped_count, "pending": flush_result["pending"], "failed": flush_result["failed"]}
 
         except Exception as e:
             print(f"❌ Mail Processing Error: {e}")
@@ -175,17 +191,20 @@ class MailAgent:
         {{
             "is_relevant": true/false,
             "category": "general" | "appointment" | "technical" | "billing" | "complaint",
-            "reason": "short explanation"
+            "reason": "short explanation",
+            "confidence": 0.0 - 1.0
         }}
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
+            # Background task: yields to interactive voice commands.
+            # Runs on the small model and escalates on malformed or low-confidence answers.
+            return self.llm.chat_json(
+                TASK_MAIL_CLASSIFICATION,
                 messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
+                priority=PRIORITY_BACKGROUND,
+                context={"categories": CATEGORIES}
             )
-            return json.loads(response.choices[0].message.content)
         except Exception as e:
             print(f"AI Error: {e}")
             # FALBACK: Deny by default on error to prevent spam flood
@@ -1,11 +1,18 @@
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from faster_whisper import WhisperModel, download_model
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import os
+import json
 import time
+import tempfile
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from agent import CalendarAgent
+from llm_manager import LLMManager
+from vocabulary import VocabularyCache
 
 # Load environment variables
 load_dotenv()
@@ -21,62 +28,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Whisper Model
-# model_size = "large-v3"
-# model_size = "large-v3"
-model_size = "medium"
-# model_size = "base"
-
-print(f"⏳ Loading Whisper model '{model_size}'...")
-# Standard int8 is safest and fast enough for medium on M-series
-# optimization for Apple Silicon (M-series): float16 is usually faster/better than int8
-# model = WhisperModel(model_size, device="cpu", compute_type="int8")
-# M5 Optimization: Use more threads (default is 4)
-model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=8)
-print(f"✅ Whisper model '{model_size}' loaded successfully!")
+# Production mode (start.sh --prod): the Whisper model, confirmation store and LLM priority
+# live in a single inference process shared by all uvicorn workers (see inference_server.py).
+# Otherwise (development) everything is loaded into this process.
+if os.environ.get("INFERENCE_ADDRESS"):
+    from inference_server import connect
+    inference = connect()
+    transcriber = inference.transcriber()
+    pending = inference.pending()
+    llm = LLMManager(gate=inference.llm_gate())
+    print(f"✅ Worker {os.getpid()} connected to inference process")
+else:
+    from transcriber import Transcriber
+    inference = None
+    transcriber = Transcriber()
+    pending = None
+    # Shared Local LLM (Ollama): warm-up + keep-alive in the background, priority for voice commands
+    llm = LLMManager()
+    llm.start()
 
 # Initialize Calendar Agent
 try:
-    agent = CalendarAgent()
+    agent = CalendarAgent(llm, pending)
     print("✅ Calendar Agent initialized!")
 except Exception as e:
     print(f"❌ Failed to initialize Calendar Agent: {e}")
     agent = None
 
+# Per-user Whisper prompt from recent calendar events (refreshed in the background)
+vocabulary = VocabularyCache(agent)
+
+async def _save_upload(file: UploadFile) -> str:
+    """Writes an upload to a unique temp file (several requests/workers may upload 'recording.wav' at once)."""
+    suffix = os.path.splitext(file.filename or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(prefix="temp_", suffix=suffix, delete=False) as buffer:
+        buffer.write(await file.read())
+        return buffer.name
+
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
 @app.post("/transcribe-file")
-async def transcribe_file(file: UploadFile = File(...)):
+async def transcribe_file(
+    file: UploadFile = File(...),
+    auth_token: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None)
+):
     start_time = time.time()
     
     # Save uploaded file temporarily
-    temp_filename = f"temp_{file.filename}"
-    with open(temp_filename, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    temp_filename = await _save_upload(file)
     
     try:
         # Transcribe
-        # Optimization: beam_size=5 is standard and much faster than 10 with negligible accuracy loss
-        segments, info = model.transcribe(
-            temp_filename, 
-            beam_size=5, 
-            language="de",
-            initial_prompt="Das ist ein Befehl für einen KI Kalender-Assistenten. Zum Beispiel: 'Lege einen Termin zum Mittagessen an'.",
-            vad_filter=True,
-            vad_parameters=dict(min_silence_duration_ms=500)
-        )
-        
-        transcription_text = ""
-        for segment in segments:
-            transcription_text += segment.text + " "
+        result = await run_in_threadpool(transcriber.transcribe, temp_filename, vocabulary.prompt_for(user_id, auth_token))
             
         execution_time = time.time() - start_time
         
-        return {
-            "text": transcription_text.strip(),
-            "language": info.language,
-            "probability": info.language_probability,
-            "duration": execution_time
-        }
+        return {**result, "duration": execution_time}
     except Exception as e:
         return {"error": str(e)}
     finally:
@@ -84,11 +94,10 @@ async def transcribe_file(file: UploadFile = File(...)):
         if os.path.exists(temp_filename):
             os.remove(temp_filename)
 
-from typing import Optional
-
 class CommandRequest(BaseModel):
     text: str
     auth_token: Optional[str] = None # Optional user token
+    user_id: Optional[str] = None # Supabase user id (vocabulary cache key)
     dry_run: bool = False # Optional confirmation flag
 
 @app.post("/process-command")
@@ -100,12 +109,104 @@ async def process_command(request: CommandRequest):
     if not agent:
         return {"status": "error", "message": "Calendar Agent not initialized. Check server logs."}
     
-    result = agent.process(request.text, request.auth_token, request.dry_run)
+    # Warm this user's vocabulary so the next recording already uses it
+    vocabulary.prompt_for(request.user_id, request.auth_token)
+    
+    # Run in threadpool so a running mail scan cannot block interactive commands
+    result = await run_in_threadpool(agent.process, request.text, request.auth_token, request.dry_run)
     return result
 
+class ConfirmRequest(BaseModel):
+    confirmation_token: str
+    auth_token: Optional[str] = None
+
+@app.post("/confirm-command")
+async def confirm_command(request: ConfirmRequest):
+    """
+    Executes a command that was previously dry-run via /process-command or /voice-command,
+    using the stored interpretation and resolved events instead of reprocessing the text.
+    """
+    if not agent:
+        return {"status": "error", "message": "Calendar Agent not initialized. Check server logs."}
+    
+    return await run_in_threadpool(agent.confirm, request.confirmation_token, request.auth_token)
+
+def _sse(event: str, data: dict) -> str:
+    """Formats a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/voice-command")
+async def voice_command(
+    file: UploadFile = File(...),
+    auth_token: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    dry_run: bool = Form(False)
+):
+    """
+    Single round-trip voice pipeline: Transcribe -> Interpret -> Execute.
+    Streams each stage as a server-sent event as soon as it completes:
+    `transcript`, `intent`, then `result` (or `error`), followed by `done`.
+    """
+    start_time = time.time()
+
+    # Read upload before the response starts streaming (the request body is gone afterwards).
+    # It is removed by the response's background task, which also runs if the client disconnects.
+    temp_filename = await _save_upload(file)
+
+    async def pipeline():
+        # 1. Transcribe
+        try:
+            transcript = await run_in_threadpool(transcriber.transcribe, temp_filename, vocabulary.prompt_for(user_id, auth_token))
+        except Exception as e:
+            yield _sse("error", {"stage": "transcribe", "message": str(e)})
+            return
+
+        text = transcript["text"]
+        yield _sse("transcript", {**transcript, "duration": time.time() - start_time})
+
+        if not text:
+            yield _sse("error", {"stage": "transcribe", "message": "Keine Sprache erkannt."})
+            return
+
+        if not agent:
+            yield _sse("error", {"stage": "interpret", "message": "Calendar Agent not initialized. Check server logs."})
+            return
+
+        # 2. Interpret
+        try:
+            interpretation = await run_in_threadpool(agent.interpret_command, text)
+        except Exception as e:
+            yield _sse("error", {"stage": "interpret", "message": str(e)})
+            return
+        print(f"🧠 Interpretation: {json.dumps(interpretation, indent=2)}")
+        if interpretation.get("intent") == "error":
+            yield _sse("error", {"stage": "interpret", "message": interpretation.get("message")})
+            return
+        yield _sse("intent", interpretation)
+
+        # 3. Execute (or dry-run -> confirmation)
+        try:
+            result = await run_in_threadpool(agent.execute_action, interpretation, auth_token, dry_run)
+        except Exception as e:
+            yield _sse("error", {"stage": "execute", "message": str(e)})
+            return
+        yield _sse("result", result)
+
+    async def stages():
+        async for event in pipeline():
+            yield event
+        yield _sse("done", {"duration": time.time() - start_time})
+
+    return StreamingResponse(
+        stages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_remove_file, temp_filename)
+    )
+
 # --- Mail Agent Integration ---
 from mail_agent import MailAgent
-mail_agent = MailAgent()
+mail_agent = MailAgent(llm)
 
 class EmailScanRequest(BaseModel):
     auth_token: str
@@ -120,7 +221,28 @@ async def scan_emails(request: EmailScanRequest):
     if not mail_agent:
         return {"status": "error", "message": "Mail Agent not initialized."}
     
-    return mail_agent.scan_and_process(request.auth_token, request.user_id)
+    return await run_in_threadpool(mail_agent.scan_and_process, request.auth_token, request.user_id)
+
+@app.get("/healthz")
+async def healthz():
+    """Per-worker health: this worker's pid, mode and whether the model is reachable."""
+    health = {
+        "status": "ok",
+        "worker_pid": os.getpid(),
+        "mode": "inference-process" if inference else "single-process",
+        "calendar_agent": agent is not None
+    }
+    try:
+        health["whisper"] = await run_in_threadpool(transcriber.info)
+    except Exception as e:
+        health["status"] = "degraded"
+        health["whisper"] = {"error": str(e)}
+    return health
+
+@app.get("/llm-status")
+async def llm_status():
+    """Shows which LLM models are currently resident in Ollama."""
+    return {"models": await run_in_threadpool(llm.refresh_residency)}
 
 if __name__ == "__main__":
     import uvicorn
@@ -35,6 +35,48 @@ export WHISPER_MODEL=base  # base ist schneller als small, aber immer noch gut
 export WHISPER_DEVICE=cpu
 export WHISPER_COMPUTE_TYPE=int8
 
+# Produktionsmodus: ./start.sh --prod
+# Ein Inference-Prozess hält das Whisper-Modell (nur einmal im Speicher),
+# mehrere uvicorn-Worker verarbeiten HTTP- und Google-API-Anfragen parallel.
+if [ "$1" == "--prod" ]; then
+    export INFERENCE_ADDRESS=${INFERENCE_ADDRESS:-127.0.0.1:9100}
+    export INFERENCE_AUTHKEY=${INFERENCE_AUTHKEY:-$(python -c "import secrets; print(secrets.token_hex(16))")}
+    WORKERS=${WEB_CONCURRENCY:-$(python -c "import os; print(os.cpu_count() or 2)")}
+
+    echo ""
+    echo -e "${GREEN}✓ Starte Inference-Prozess (${INFERENCE_ADDRESS})...${NC}"
+    python inference_server.py &
+    INFERENCE_PID=$!
+
+    # Warten bis das Modell geladen ist
+    until python -c "from inference_server import connect; connect()" 2>/dev/null; do
+        if ! kill -0 $INFERENCE_PID 2>/dev/null; then
+            echo -e "${YELLOW}⚠️  Inference-Prozess konnte nicht gestartet werden${NC}"
+            exit 1
+        fi
+        sleep 1
+    done
+
+    echo -e "${GREEN}✓ Starte ${WORKERS} API-Worker auf Port 9000...${NC}"
+    uvicorn server:app --host 0.0.0.0 --port 9000 --workers "$WORKERS" --timeout-graceful-shutdown 30 &
+    UVICORN_PID=$!
+
+    # Graceful Shutdown: erst Worker (laufende Requests beenden), dann Inference-Prozess
+    shutdown() {
+        echo ""
+        echo -e "${BLUE}Beende Server...${NC}"
+        kill -TERM $UVICORN_PID 2>/dev/null
+        wait $UVICORN_PID 2>/dev/null
+        kill -TERM $INFERENCE_PID 2>/dev/null
+        wait $INFERENCE_PID 2>/dev/null
+        exit 0
+    }
+    trap shutdown INT TERM
+
+    wait $UVICORN_PID
+    shutdown
+fi
+
 echo ""
 echo -e "${GREEN}✓ Whisper-Server wird gestartet...${NC}"
 echo -e "${BLUE}  Model: ${WHISPER_MODEL}${NC}"
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_preprocess import SAMPLE_RATE, preprocess  # noqa: E402
+
+rng = np.random.default_rng(0)
+
+
+def noise(seconds: float, rms: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    return rng.normal(0, rms, int(seconds * sample_rate))
+
+
+def speech(seconds: float, rms: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Speech-like signal: harmonics with a ~4 Hz syllable envelope, scaled to `rms`."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = sum(np.sin(2 * np.pi * f * t) / i for i, f in enumerate((140, 280, 420, 700), 1))
+    envelope = 0.3 + 0.7 * np.abs(np.sin(2 * np.pi * 2 * t))
+    signal = voiced * envelope
+    return signal * (rms / np.sqrt(np.mean(signal ** 2)))
+
+
+def test_speech_filled_clip_in_noisy_room_is_kept():
+    audio = speech(3.2, 0.08) + noise(3.2, 0.02)
+    result, stats = preprocess(audio)
+    assert result is not None
+    assert stats["trimmed_duration"] >= 3.0
+
+
+def test_soft_speech_over_fan_noise_is_kept():
+    fan = noise(3.0, 0.02)
+    fan[SAMPLE_RATE:2 * SAMPLE_RATE] += speech(1.0, 0.03)
+    result, stats = preprocess(fan)
+    assert result is not None
+    assert stats["trimmed_duration"] >= 1.0
+
+
+def test_quiet_mic_with_silence_is_kept_and_trimmed():
+    audio = np.concatenate([noise(1.0, 0.0001), speech(1.0, 0.005), noise(1.0, 0.0001)])
+    result, stats = preprocess(audio)
+    assert result is not None
+    assert 1.0 <= stats["trimmed_duration"] <= 1.6
+    # Normalized for Whisper
+    assert np.max(np.abs(result)) > 0.5
+
+
+def test_leading_and_trailing_silence_is_trimmed():
+    audio = np.concatenate([noise(2.0, 0.001), speech(1.0, 0.1), noise(2.0, 0.001)])
+    _, stats = preprocess(audio)
+    assert stats["original_duration"] == 5.0
+    assert 1.0 <= stats["trimmed_duration"] <= 1.6
+
+
+def test_empty_tap_with_mic_hiss_is_rejected():
+    result, stats = preprocess(noise(2.0, 0.0005))
+    assert result is None
+    assert stats["trimmed_duration"] == 0.0
+
+
+def test_digital_silence_is_rejected():
+    result, _ = preprocess(np.zeros(SAMPLE_RATE))
+    assert result is None
+
+
+def test_48khz_stereo_is_downmixed_and_resampled():
+    mono = speech(1.0, 0.1, sample_rate=48000)
+    stereo = np.stack([mono, mono], axis=1)
+    result, stats = preprocess(stereo, sample_rate=48000)
+    assert result is not None
+    assert result.dtype == np.float32
+    assert result.ndim == 1
+    assert stats["original_duration"] == 1.0
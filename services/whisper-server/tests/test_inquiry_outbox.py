@@ -0,0 +1,128 @@
+import os
+import sys
+
+import pytest
+from postgrest.exceptions import APIError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inquiry_outbox import InquiryOutbox  # noqa: E402
+
+
+class StubSupabase:
+    """Minimal `table().upsert().execute()` client. `reject(row)` returns an error code or None."""
+
+    def __init__(self, reject=None, exception=None):
+        self.reject = reject or (lambda row: None)
+        self.exception = exception
+        self.requests = 0
+        self.stored = {}
+
+    def table(self, name):
+        return self
+
+    def upsert(self, batch, **kwargs):
+        self._batch = batch
+        return self
+
+    def execute(self):
+        self.requests += 1
+        if self.exception:
+            raise self.exception
+        for row in self._batch:
+            code = self.reject(row)
+            if code:
+                # Postgres rejects the whole statement
+                raise APIError({"code": code, "message": f"rejected ({code})", "details": None, "hint": None})
+        for row in self._batch:
+            self.stored[row["idempotency_key"]] = row
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return InquiryOutbox(path=str(tmp_path / "outbox.db"), batch_size=50, backoff_seconds=0)
+
+
+def fill(outbox, count):
+    for i in range(count):
+        outbox.enqueue(f"gmail:{i:03d}", {"subject": f"Anfrage {i}"})
+
+
+def test_pending_rows_are_sent_in_batches(outbox):
+    fill(outbox, 120)
+    supabase = StubSupabase()
+    result = outbox.flush(supabase)
+    assert result == {"sent": 120, "pending": 0, "failed": 0}
+    assert supabase.requests == 3
+
+
+def test_missing_migration_keeps_everything_pending(outbox):
+    fill(outbox, 120)
+    supabase = StubSupabase(reject=lambda row: "42P10")
+    for _ in range(3):
+        result = outbox.flush(supabase)
+        assert result == {"sent": 0, "pending": 120, "failed": 0}
+    # One request per flush, no bisecting
+    assert supabase.requests == 3
+
+
+@pytest.mark.parametrize("code", ["42501", "PGRST204", "PGRST301"])
+def test_auth_and_schema_errors_are_systemic(outbox, code):
+    fill(outbox, 10)
+    supabase = StubSupabase(reject=lambda row: code)
+    assert outbox.flush(supabase)["pending"] == 10
+    assert supabase.requests == 1
+
+
+def test_unknown_error_on_every_row_stops_bisecting(outbox):
+    fill(outbox, 120)
+    supabase = StubSupabase(reject=lambda row: "23502")
+    for _ in range(3):
+        result = outbox.flush(supabase)
+        assert result == {"sent": 0, "pending": 120, "failed": 0}
+    # Batch, two halves, two single-row probes per flush
+    assert supabase.requests == 3 * 5
+
+
+def test_poison_row_is_isolated_and_dead_lettered(outbox):
+    fill(outbox, 10)
+    supabase = StubSupabase(reject=lambda row: "23514" if row["idempotency_key"] == "gmail:000" else None)
+    assert outbox.flush(supabase) == {"sent": 9, "pending": 1, "failed": 0}
+
+    outbox.enqueue("gmail:new", {"subject": "Neu"})
+    assert outbox.flush(supabase) == {"sent": 1, "pending": 1, "failed": 0}
+    assert "gmail:new" in supabase.stored
+
+    assert outbox.flush(supabase) == {"sent": 0, "pending": 0, "failed": 1}
+    assert "gmail:000" not in supabase.stored
+
+
+def test_poison_rows_with_the_same_code_in_both_halves_are_isolated(outbox):
+    fill(outbox, 10)
+    poison = {"gmail:001", "gmail:007"}
+    supabase = StubSupabase(reject=lambda row: "23514" if row["idempotency_key"] in poison else None)
+    result = outbox.flush(supabase)
+    assert result["sent"] == 8
+    assert poison.isdisjoint(supabase.stored)
+
+
+def test_requeue_failed_redrives_dead_letters(outbox):
+    fill(outbox, 1)
+    rejecting = StubSupabase(reject=lambda row: "23514")
+    for _ in range(3):
+        outbox.flush(rejecting)
+    assert outbox.flush(rejecting)["failed"] == 1
+    # Still known, so the scan does not analyze the mail again
+    assert outbox.contains("gmail:000")
+
+    assert outbox.requeue_failed() == 1
+    result = outbox.flush(StubSupabase())
+    assert result == {"sent": 1, "pending": 0, "failed": 0}
+
+
+def test_connection_errors_keep_rows_pending_without_attempts(outbox):
+    fill(outbox, 5)
+    supabase = StubSupabase(exception=ConnectionError("Supabase down"))
+    for _ in range(5):
+        assert outbox.flush(supabase) == {"sent": 0, "pending": 5, "failed": 0}
+    assert outbox.flush(StubSupabase())["sent"] == 5
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vocabulary import BASE_PROMPT, VocabularyCache  # noqa: E402
+
+ACCOUNTS = {"token-anna": "anna@firma.de", "token-anna-rotated": "anna@firma.de", "token-mallory": "mallory@example.com"}
+
+
+class StubAgent:
+    def __init__(self):
+        self.event_calls = []
+        self.account_calls = 0
+
+    def calendar_account(self, auth_token):
+        self.account_calls += 1
+        if auth_token not in ACCOUNTS:
+            raise RuntimeError("401 Unauthorized")
+        return ACCOUNTS[auth_token]
+
+    def list_recent_events(self, auth_token=None):
+        self.event_calls.append(auth_token)
+        owner = ACCOUNTS.get(auth_token, "local")
+        return [{"summary": f"Jour fixe {owner}"}]
+
+
+def prompt(cache, *args):
+    """Looks up a prompt and waits for the background refresh it triggered."""
+    result = cache.prompt_for(*args)
+    for _ in range(100):
+        if not cache._refreshing:
+            break
+        time.sleep(0.01)
+    return result
+
+
+def test_prompt_is_built_in_background_and_survives_token_rotation():
+    cache = VocabularyCache(StubAgent())
+    assert prompt(cache, "user-1", "token-anna") == BASE_PROMPT
+    assert "anna@firma.de" in prompt(cache, "user-1", "token-anna")
+
+    # New token of the same account: resolved once, then the existing entry is used
+    prompt(cache, "user-1", "token-anna-rotated")
+    assert "anna@firma.de" in prompt(cache, "user-1", "token-anna-rotated")
+    assert cache.agent.event_calls == ["token-anna"]
+
+
+def test_user_id_alone_gets_no_vocabulary():
+    cache = VocabularyCache(StubAgent())
+    prompt(cache, "user-1", "token-anna")
+    assert prompt(cache, "user-1") == BASE_PROMPT
+
+
+def test_foreign_token_neither_reads_nor_overwrites_the_entry():
+    cache = VocabularyCache(StubAgent())
+    prompt(cache, "user-1", "token-anna")
+
+    prompt(cache, "user-1", "token-mallory")
+    assert "anna@firma.de" not in prompt(cache, "user-1", "token-mallory")
+    assert "anna@firma.de" in prompt(cache, "user-1", "token-anna")
+
+
+def test_token_without_user_id_never_touches_the_local_entry():
+    cache = VocabularyCache(StubAgent())
+    assert prompt(cache, None, "token-anna") == BASE_PROMPT
+    assert cache.agent.event_calls == []
+    prompt(cache)
+    assert "local" in prompt(cache)
+
+
+def test_unresolvable_token_is_not_retried_on_every_request():
+    cache = VocabularyCache(StubAgent())
+    prompt(cache, "user-1", "expired")
+    prompt(cache, "user-1", "expired")
+    assert prompt(cache, "user-1", "expired") == BASE_PROMPT
+    assert cache.agent.account_calls == 1
@@ -0,0 +1,60 @@
+import os
+from faster_whisper import WhisperModel
+from audio_preprocess import load_and_preprocess
+from vocabulary import BASE_PROMPT
+
+# Initialize Whisper Model
+# model_size = "large-v3"
+# model_size = "large-v3"
+model_size = "medium"
+# model_size = "base"
+
+
+class Transcriber:
+    """Owns the Whisper model. Runs in the API process (dev) or in the inference process (production)."""
+
+    def __init__(self):
+        print(f"⏳ Loading Whisper model '{model_size}'...")
+        # Standard int8 is safest and fast enough for medium on M-series
+        # optimization for Apple Silicon (M-series): float16 is usually faster/better than int8
+        # model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        # M5 Optimization: Use more threads (default is 4)
+        self.model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=8)
+        print(f"✅ Whisper model '{model_size}' loaded successfully!")
+
+    def info(self):
+        return {"model": model_size, "pid": os.getpid()}
+
+    def transcribe(self, path: str, initial_prompt: str = None):
+        """
+        Preprocesses a local audio file (16 kHz mono, silence trimmed) and runs Whisper on it.
+        `initial_prompt` carries the user's vocabulary (names, meeting titles), see vocabulary.py.
+        Returns a dict with text, language, probability and audio stats.
+        Recordings without speech are rejected before the model is invoked.
+        """
+        audio, stats = load_and_preprocess(path)
+        if audio is None:
+            print(f"🔇 No speech detected ({stats['original_duration']}s recording), skipping Whisper")
+            return {"text": "", "language": "de", "probability": 0.0, "empty": True, **stats}
+
+        # Optimization: beam_size=5 is standard and much faster than 10 with negligible accuracy loss
+        segments, info = self.model.transcribe(
+            audio,
+            beam_size=5,
+            language="de",
+            initial_prompt=initial_prompt or BASE_PROMPT,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=500)
+        )
+
+        transcription_text = ""
+        for segment in segments:
+            transcription_text += segment.text + " "
+
+        return {
+            "text": transcription_text.strip(),
+            "language": info.language,
+            "probability": info.language_probability,
+            "empty": False,
+            **stats
+        }
@@ -0,0 +1,185 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Fixed part of Whisper's initial_prompt
+BASE_PROMPT = "Das ist ein Befehl für einen KI Kalender-Assistenten. Zum Beispiel: 'Lege einen Termin zum Mittagessen an'."
+
+
+def _name_from_email(email: str):
+    """'anna.mueller@firma.de' -> 'Anna Mueller' (only for first.last style addresses)."""
+    if not email or "calendar.google.com" in email:
+        return None
+    local = email.split("@")[0]
+    if "." not in local:
+        return None
+    return " ".join(part.capitalize() for part in local.split(".") if part)
+
+
+def extract_terms(events: list):
+    """Event titles and attendee names, most frequent first (recurring meetings rank high)."""
+    counts = Counter()
+    for event in events:
+        summary = (event.get("summary") or "").strip()
+        if summary:
+            counts[summary] += 1
+        for person in [*event.get("attendees", []), event.get("organizer", {})]:
+            if person.get("self") or person.get("resource"):
+                continue
+            name = (person.get("displayName") or "").strip() or _name_from_email(person.get("email"))
+            if name:
+                counts[name] += 1
+    return [term for term, _ in counts.most_common()]
+
+
+def build_prompt(terms: list, max_chars: int = 300, max_term_length: int = 60):
+    """Appends as many terms as fit into `max_chars` (Whisper only uses ~220 prompt tokens)."""
+    selected = []
+    seen = set()
+    length = 0
+    for term in terms:
+        key = term.lower()
+        if key in seen or len(term) > max_term_length:
+            continue
+        if length + len(term) + 2 > max_chars:
+            break
+        seen.add(key)
+        selected.append(term)
+        length += len(term) + 2
+    if not selected:
+        return BASE_PROMPT
+    return f"{BASE_PROMPT} Häufige Namen und Termine: {', '.join(selected)}."
+
+
+class VocabularyCache:
+    """
+    Per-user Whisper prompt built from recent calendar events (titles + attendee names),
+    so names and recurring meeting titles are transcribed correctly in the first place.
+    Entries are keyed by Supabase user id plus the Google account that built them: a token
+    is resolved to its account (cached per token, Google tokens rotate hourly) and only
+    sees entries of that account. Requests without user and token use the server's own
+    token.json login ("local").
+    Lookups never block: stale or missing entries are rebuilt in a background thread and
+    the base prompt is used until then.
+    """
+
+    def __init__(self, agent, ttl_seconds: int = 1800, max_chars: int = 300, max_users: int = 100,
+                 account_ttl_seconds: int = 3600, retry_seconds: int = 60):
+        self.agent = agent
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self.max_users = max_users
+        self.account_ttl_seconds = account_ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._entries = OrderedDict()   # (user id, account) or "local" -> prompt
+        self._accounts = OrderedDict()  # token hash -> Google account
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _token_hash(auth_token: str) -> str:
+        # Never keep raw tokens around
+        return hashlib.sha256(auth_token.encode()).hexdigest()
+
+    def _resolved_account(self, auth_token: str):
+        """Cached {"account": ...} for this token (account None if resolving failed recently), or None."""
+        with self._lock:
+            resolved = self._accounts.get(self._token_hash(auth_token))
+        if resolved and time.monotonic() - resolved["resolved_at"] <= self.account_ttl_seconds:
+            return resolved
+        return None
+
+    def prompt_for(self, user_id: str = None, auth_token: str = None) -> str:
+        """
+        Returns the cached prompt for this user and Google account and schedules a
+        refresh (with the current `auth_token`) if it is missing or stale.
+        """
+        if not self.agent:
+            return BASE_PROMPT
+
+        if auth_token and user_id:
+            resolved = self._resolved_account(auth_token)
+            if resolved is None:
+                # Unknown token: find out whose it is in the background
+                self._schedule_refresh(user_id, auth_token)
+                return BASE_PROMPT
+            if resolved["account"] is None:
+                return BASE_PROMPT
+            key = (user_id, resolved["account"])
+        elif auth_token or user_id:
+            # A token without a user id cannot be cached and must never fill the "local" entry;
+            # a user id without a token proves nothing
+            return BASE_PROMPT
+        else:
+            key = "local"
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+
+        if entry is None or time.monotonic() - entry["built_at"] > self.ttl_seconds:
+            self._schedule_refresh(user_id, auth_token)
+
+        return entry["prompt"] if entry else BASE_PROMPT
+
+    def _schedule_refresh(self, user_id: str = None, auth_token: str = None):
+        job = self._token_hash(auth_token) if auth_token else "local"
+        with self._lock:
+            if job in self._refreshing:
+                return
+            self._refreshing.add(job)
+        threading.Thread(
+            target=self._refresh, args=(job, user_id, auth_token), name="vocabulary-refresh", daemon=True
+        ).start()
+
+    def _refresh(self, job: str, user_id: str = None, auth_token: str = None):
+        key = None if auth_token else "local"
+        try:
+            if key is None:
+                key = (user_id, self._resolve_account(job, auth_token))
+
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry and time.monotonic() - entry["built_at"] <= self.ttl_seconds:
+                return
+
+            events = self.agent.list_recent_events(auth_token)
+            terms = extract_terms(events)
+            prompt = build_prompt(terms, self.max_chars)
+            with self._lock:
+                self._entries[key] = {"prompt": prompt, "terms": len(terms), "built_at": time.monotonic()}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+            print(f"📚 Vocabulary updated ({len(terms)} terms from {len(events)} events)")
+        except Exception as e:
+            print(f"⚠️ Vocabulary refresh failed: {e}")
+            with self._lock:
+                # Fall back to the base prompt and retry in a minute instead of on every request
+                retry_at = time.monotonic() + self.retry_seconds
+                if key is None:
+                    # The token could not be resolved to an account
+                    self._accounts[job] = {"account": None, "resolved_at": retry_at - self.account_ttl_seconds}
+                else:
+                    self._entries.setdefault(key, {
+                        "prompt": BASE_PROMPT,
+                        "terms": 0,
+                        "built_at": retry_at - self.ttl_seconds
+                    })
+        finally:
+            with self._lock:
+                self._refreshing.discard(job)
+
+    def _resolve_account(self, job: str, auth_token: str) -> str:
+        resolved = self._resolved_account(auth_token)
+        if resolved and resolved["account"]:
+            return resolved["account"]
+        account = self.agent.calendar_account(auth_token)
+        with self._lock:
+            self._accounts[job] = {"account": account, "resolved_at": time.monotonic()}
+            self._accounts.move_to_end(job)
+            while len(self._accounts) > self.max_users:
+                self._accounts.popitem(last=False)
+        return account
@@ -1,6 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { useVoice } from '@/contexts/VoiceContext';
-import { transcribeAudio, executeVoiceCommand, logVoiceCommand } from '@/services/whisperService';
+import { transcribeAudio, executeVoiceCommand, confirmVoiceCommand, streamVoiceCommand, logVoiceCommand } from '@/services/whisperService';
 import { useAuth } from '@/contexts/AuthContext';
 import { Link } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
@@ -36,6 +36,7 @@ const CalSpeakBuddy = () => {
   const [showConfirmationDialog, setShowConfirmationDialog] = useState(false);
   const [confirmationMessage, setConfirmationMessage] = useState("");
   const [pendingCommandText, setPendingCommandText] = useState<string>("");
+  const [pendingConfirmationToken, setPendingConfirmationToken] = useState<string | null>(null);
   const [timeRemaining, setTimeRemaining] = useState<string>("");
   const [isNaturalMode, setIsNaturalMode] = useState(false);
   const [isSynthesizing, setIsSynthesizing] = useState(false);
@@ -333,25 +334,23 @@ const CalSpeakBuddy = () => {
 
     setIsUploading(true);
     try {
-      const result = await transcribeAudio(blob);
+      if (isNaturalMode) {
+        // Single round-trip: transcript, intent and result stream in from /voice-command
+        await executeStreamedCommand(blob);
+        setAudioBlob(null);
+        return;
+      }
+
+      const result = await transcribeAudio(blob, googleToken, user?.id);
 
       setTranscription(result.text);
       setEditedTranscription(result.text);
-
-      if (isNaturalMode) {
-        if (result.text.trim().length > 2) {
-          executeCommand(result.text, false);
-        } else {
-          toast({ title: "Ignoriert", description: "Keine Sprache erkannt." });
-        }
-      } else {
-        setIsConfirmationPending(true);
-        setIsEditing(false);
-        toast({
-          title: "Transkription erfolgreich",
-          description: `Audio transkribiert (${result.duration?.toFixed(1)}s)`,
-        });
-      }
+      setIsConfirmationPending(true);
+      setIsEditing(false);
+      toast({
+        title: "Transkription erfolgreich",
+        description: `Audio transkribiert (${result.duration?.toFixed(1)}s)`,
+      });
 
       setAudioBlob(null);
     } catch (error) {
@@ -369,89 +368,132 @@ const CalSpeakBuddy = () => {
     }
   };
 
-  const executeCommand = async (text: string, dryRun: boolean, silent: boolean = false) => {
-    if (!text) return;
+  const executeStreamedCommand = async (blob: Blob) => {
+    let text = '';
 
-    setIsProcessingCommand(true);
-    setCommandResponse(null);
-    if (!dryRun && !silent) setEvents([]);
+    try {
+      const data = await streamVoiceCommand(blob, googleToken, false, user?.id, (stage, payload) => {
+        if (stage === 'transcript') {
+          // Show the transcript while the LLM is still interpreting
+          text = payload.text;
+          setTranscription(payload.text);
+          setEditedTranscription(payload.text);
+          setIsUploading(false);
+          setIsProcessingCommand(true);
+          setCommandResponse(null);
+          setEvents([]);
+        } else if (stage === 'error') {
+          if (payload.stage === 'transcribe' && !text) {
+            toast({ title: "Ignoriert", description: "Keine Sprache erkannt." });
+          } else {
+            handleCommandResult({ status: 'error', message: payload.message }, text, false);
+          }
+        }
+      });
 
-    if (dryRun) {
+      if (data) handleCommandResult(data, text, false);
+    } finally {
+      setIsProcessingCommand(false);
+    }
+  };
+
+  const handleCommandResult = (data: any, text: string, dryRun: boolean, silent: boolean = false) => {
+    if (data.status === 'confirmation_required') {
       setPendingCommandText(text);
+      setPendingConfirmationToken(data.confirmation_token ?? null);
+      if (isNaturalMode) {
+        // In natural mode, we speak the warning and listen for confirmation
+        speakText(data.message + " Bitte bestätigen mit Ja oder Nein.");
+        // Ideally we would switch to a specific "confirmation listening mode" here
+        // For now, let's fall back to manual dialog so they see the importance
+        setConfirmationMessage(data.message);
+        setShowConfirmationDialog(true);
+      } else {
+        setConfirmationMessage(data.message);
+        setShowConfirmationDialog(true);
+      }
+      return;
     }
 
-    try {
-      console.log(`Sende Befehl an Backend (DryRun: ${dryRun}):`, text);
+    if (data.status === 'success') {
+      if (!silent) setCommandResponse(data.message);
 
-      const data = await executeVoiceCommand(text, googleToken, dryRun);
-      console.log("Backend Antwort:", data);
+      // Feature 5: Sprachbefehl loggen
+      if (!dryRun && user) {
+        logVoiceCommand(user.id, text, data.intent, data.message);
+      }
 
-      if (data.status === 'confirmation_required') {
-        if (isNaturalMode) {
-          // In natural mode, we speak the warning and listen for confirmation
-          speakText(data.message + " Bitte bestätigen mit Ja oder Nein.");
-          // Ideally we would switch to a specific "confirmation listening mode" here
-          // For now, let's fall back to manual dialog so they see the importance
-          setConfirmationMessage(data.message);
-          setShowConfirmationDialog(true);
-        } else {
-          setConfirmationMessage(data.message);
-          setShowConfirmationDialog(true);
+      if (isNaturalMode && data.message) {
+        const cleanMsg = data.voice_message || data.message.replace(/<[^>]*>?/gm, '');
+        speakText(cleanMsg);
+      }
+
+      if (data.intent === 'list_events' && Array.isArray(data.data)) {
+        setEvents(data.data);
+        setLastUpdated(new Date());
+        if (!silent) {
+          toast({
+            title: "Termine geladen",
+            description: `${data.data.length} Termine gefunden.`,
+          });
+        }
+      } else {
+        if (!silent) {
+          toast({
+            title: "Erfolg!",
+            description: data.message,
+          });
         }
-        return;
       }
 
-      if (data.status === 'success') {
-        if (!silent) setCommandResponse(data.message);
+      if (!silent) {
+        setTimeout(() => {
+          setIsConfirmationPending(false);
+          setTranscription('');
+          setEditedTranscription('');
+          setAudioBlob(null);
+          audioChunksRef.current = [];
+          setIsEditing(false);
+        }, 2000);
+      }
+    } else {
+      setCommandResponse(`Fehler: ${data.message}`);
+      if (isNaturalMode) speakText("Fehler: " + data.message);
+      toast({
+        title: "Fehler",
+        description: data.message,
+        variant: "destructive",
+      });
+    }
+  };
 
-        // Feature 5: Sprachbefehl loggen
-        if (!dryRun && user) {
-          logVoiceCommand(user.id, text, data.intent, data.message);
-        }
+  const executeCommand = async (text: string, dryRun: boolean, silent: boolean = false, confirmationToken?: string | null) => {
+    if (!text) return;
 
-        if (isNaturalMode && data.message) {
-          const cleanMsg = data.voice_message || data.message.replace(/<[^>]*>?/gm, '');
-          speakText(cleanMsg);
-        }
+    setIsProcessingCommand(true);
+    setCommandResponse(null);
+    if (!dryRun && !silent) setEvents([]);
 
-        if (data.intent === 'list_events' && Array.isArray(data.data)) {
-          setEvents(data.data);
-          setLastUpdated(new Date());
-          if (!silent) {
-            toast({
-              title: "Termine geladen",
-              description: `${data.data.length} Termine gefunden.`,
-            });
-          }
-        } else {
-          if (!silent) {
-            toast({
-              title: "Erfolg!",
-              description: data.message,
-            });
-          }
-        }
+    if (dryRun) {
+      setPendingCommandText(text);
+    }
 
-        if (!silent) {
-          setTimeout(() => {
-            setIsConfirmationPending(false);
-            setTranscription('');
-            setEditedTranscription('');
-            setAudioBlob(null);
-            audioChunksRef.current = [];
-            setIsEditing(false);
-          }, 2000);
-        }
-      } else {
-        setCommandResponse(`Fehler: ${data.message}`);
-        if (isNaturalMode) speakText("Fehler: " + data.message);
-        toast({
-          title: "Fehler",
-          description: data.message,
-          variant: "destructive",
-        });
-      }
+    try {
+      console.log(`Sende Befehl an Backend (DryRun: ${dryRun}):`, text);
+
+      let isDryRun = dryRun;
+      let data = confirmationToken
+        ? await confirmVoiceCommand(confirmationToken, googleToken)
+        : await executeVoiceCommand(text, googleToken, dryRun, user?.id);
 
+      // Confirmation expired on the server -> run a fresh dry run and ask again,
+      // never execute without a confirmation the user has actually seen
+      if (confirmationToken && data.code === 'confirmation_expired') {
+        isDryRun = true;
+        data = await executeVoiceCommand(text, googleToken, true, user?.id);
+      }
+      console.log("Backend Antwort:", data);
+      handleCommandResult(data, text, isDryRun, silent);
     } catch (error: any) {
       console.error('Fehler beim Ausführen des Befehls:', error);
       const errorMessage = error.name === 'AbortError'
@@ -474,7 +516,8 @@ const CalSpeakBuddy = () => {
 
   const executeConfirmedCommand = () => {
     setShowConfirmationDialog(false);
-    executeCommand(pendingCommandText, false);
+    executeCommand(pendingCommandText, false, false, pendingConfirmationToken);
+    setPendingConfirmationToken(null);
   };
 
   const discardTranscription = () => {
@@ -56,7 +56,7 @@ export default function VoiceCommandHistory() {
     if (!log.voice_command) return;
     setReplayingId(log.id);
     try {
-      const data = await executeVoiceCommand(log.voice_command, googleToken, false);
+      const data = await executeVoiceCommand(log.voice_command, googleToken, false, user?.id);
       if (data?.status === 'success') {
         toast.success('Befehl wiederholt: ' + data.message);
         if (data.intent === 'list_events' && Array.isArray(data.data)) {
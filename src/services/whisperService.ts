@@ -2,9 +2,17 @@ import { supabase } from '@/integrations/supabase/client';
 
 const WHISPER_URL = import.meta.env.VITE_WHISPER_URL || 'http://localhost:9000';
 
-export async function transcribeAudio(blob: Blob): Promise<{ text: string; duration?: number }> {
+export async function transcribeAudio(
+  blob: Blob,
+  token: string | null = null,
+  userId: string | null = null
+): Promise<{ text: string; duration?: number }> {
   const formData = new FormData();
   formData.append('file', blob, 'recording.wav');
+  // Lets the server use the user's calendar vocabulary (names, meeting titles),
+  // cached per Supabase user id since Google tokens rotate
+  if (token) formData.append('auth_token', token);
+  if (userId) formData.append('user_id', userId);
 
   const response = await fetch(`${WHISPER_URL}/transcribe-file`, {
     method: 'POST',
@@ -21,7 +29,8 @@ export async function transcribeAudio(blob: Blob): Promise<{ text: string; durat
 export async function executeVoiceCommand(
   text: string,
   token: string | null,
-  dryRun: boolean
+  dryRun: boolean,
+  userId: string | null = null
 ): Promise<any> {
   const controller = new AbortController();
   const timeoutId = setTimeout(() => controller.abort(), 120000);
@@ -30,7 +39,7 @@ export async function executeVoiceCommand(
     const response = await fetch(`${WHISPER_URL}/process-command`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ text, auth_token: token, dry_run: dryRun }),
+      body: JSON.stringify({ text, auth_token: token, user_id: userId, dry_run: dryRun }),
       signal: controller.signal,
     });
 
@@ -44,6 +53,99 @@ export async function executeVoiceCommand(
   }
 }
 
+export async function confirmVoiceCommand(
+  confirmationToken: string,
+  token: string | null
+): Promise<any> {
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), 120000);
+
+  try {
+    const response = await fetch(`${WHISPER_URL}/confirm-command`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ confirmation_token: confirmationToken, auth_token: token }),
+      signal: controller.signal,
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
+
+export type VoiceCommandStage = 'transcript' | 'intent' | 'result' | 'error' | 'done';
+
+/**
+ * Sends audio to the combined /voice-command endpoint (transcribe -> interpret -> execute)
+ * and invokes `onStage` for every server-sent event as soon as it arrives.
+ * Resolves with the final `result` payload (or null if the pipeline stopped early).
+ */
+export async function streamVoiceCommand(
+  blob: Blob,
+  token: string | null,
+  dryRun: boolean,
+  userId: string | null = null,
+  onStage?: (stage: VoiceCommandStage, data: any) => void
+): Promise<any> {
+  const formData = new FormData();
+  formData.append('file', blob, 'recording.wav');
+  if (token) formData.append('auth_token', token);
+  if (userId) formData.append('user_id', userId);
+  formData.append('dry_run', String(dryRun));
+
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), 120000);
+
+  try {
+    const response = await fetch(`${WHISPER_URL}/voice-command`, {
+      method: 'POST',
+      body: formData,
+      signal: controller.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: any = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let stage = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) stage = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+
+        const payload = data ? JSON.parse(data) : null;
+        if (stage === 'result') result = payload;
+        onStage?.(stage as VoiceCommandStage, payload);
+      }
+    }
+
+    return result;
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
+
 export async function logVoiceCommand(
   userId: string,
   command: string,
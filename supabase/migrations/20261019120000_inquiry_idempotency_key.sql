@@ -0,0 +1,7 @@
+-- Idempotency key for inquiries created by the mail agent (e.g. 'gmail:<message id>')
+-- so retried bulk inserts from the local outbox never create duplicates
+ALTER TABLE public.inquiries
+ADD COLUMN IF NOT EXISTS idempotency_key text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS inquiries_idempotency_key_idx
+ON public.inquiries (idempotency_key);